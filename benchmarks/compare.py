@@ -0,0 +1,74 @@
+"""Diff two benchmark result files produced by `run.py`.
+
+Exits with status 1 when a timing (`*_seconds`) or memory (`*_bytes`) metric grew, or a
+rate metric (`*_per_second`) dropped, by more than the threshold, or when a `within_target`
+check went from true to false.
+"""
+
+import argparse
+import json
+from pathlib import Path
+import sys
+
+
+def load(path):
+    document = json.loads(Path(path).read_text())
+    return {
+        (result["scenario"], json.dumps(result["params"], sort_keys=True)): result["metrics"]
+        for result in document["results"]
+    }
+
+
+def regressed(metric, before, after, threshold) -> bool:
+    if isinstance(before, bool) or isinstance(after, bool):
+        return metric == "within_target" and before is True and after is False
+
+    change = (after - before) / before
+    if metric.endswith(("_seconds", "_bytes")):
+        return change > threshold
+    if metric.endswith("_per_second"):
+        return change < -threshold
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare benchmark results")
+    parser.add_argument("baseline", help="Result file of the reference run")
+    parser.add_argument("candidate", help="Result file of the run to check")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative regression (default 0.10)")
+    args = parser.parse_args()
+
+    baseline = load(args.baseline)
+    candidate = load(args.candidate)
+
+    regressions = 0
+    for key in sorted(baseline.keys() & candidate.keys()):
+        scenario, params = key
+        print(f"{scenario} {params}")
+        for metric, before in sorted(baseline[key].items()):
+            after = candidate[key].get(metric)
+            if isinstance(before, bool) or isinstance(after, bool):
+                is_regression = regressed(metric, before, after, args.threshold)
+                regressions += is_regression
+                marker = "  REGRESSION" if is_regression else ""
+                print(f"  {metric:<28} {before!s:>14} -> {after!s:<14}{marker}")
+                continue
+
+            if not isinstance(before, (int, float)) or not isinstance(after, (int, float)) or before == 0:
+                print(f"  {metric:<28} {before!s:>14} -> {after!s:<14}")
+                continue
+
+            change = (after - before) / before
+            is_regression = regressed(metric, before, after, args.threshold)
+            regressions += is_regression
+            marker = "  REGRESSION" if is_regression else ""
+            print(f"  {metric:<28} {before:>14.6g} -> {after:<14.6g} {change:+.1%}{marker}")
+
+    for key in sorted(baseline.keys() - candidate.keys()):
+        print(f"{key[0]} {key[1]}: missing from candidate")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import random
+from typing import Any, Dict, List
+
+SHAPES = ("chain", "fanout", "dag")
+
+
+def dependency_graph(count: int, shape: str, seed: int = 0, max_parents: int = 3) -> List[List[int]]:
+    """Return the dependencies of every resource as indexes of earlier resources.
+
+    Dependencies always point backwards, so the resulting resource list is already in
+    topological order (the executor processes resources in document order).
+    """
+    if shape == "chain":
+        return [[index - 1] if index else [] for index in range(count)]
+
+    if shape == "fanout":
+        return [[0] if index else [] for index in range(count)]
+
+    if shape == "dag":
+        rng = random.Random(seed)
+        parents = []
+        for index in range(count):
+            candidates = range(index)
+            parents.append(sorted(rng.sample(candidates, min(len(candidates), rng.randint(0, max_parents)))))
+        return parents
+
+    raise ValueError(f"Unknown shape '{shape}', expected one of {', '.join(SHAPES)}")
+
+
+def generate_application(
+    count: int,
+    shape: str = "chain",
+    seed: int = 0,
+    kind: str = "synthetic",
+    latency_ms: float = 0,
+    plan_latency_ms: float = 0,
+    output_size: int = 16,
+    references: bool = True,
+    padding: int = 0,
+) -> Dict[str, Any]:
+    """Build an application definition with `count` resources wired up in the given shape.
+
+    With `references` every resource also consumes `${<dependency>.output.id}`, which
+    plan-only runs resolve to a "known after apply" placeholder. `padding` adds that many
+    static properties per resource to inflate the document.
+    """
+    resources = []
+    for index, parents in enumerate(dependency_graph(count, shape, seed)):
+        properties: Dict[str, Any] = {
+            "latency_ms": latency_ms,
+            "plan_latency_ms": plan_latency_ms,
+            "output_size": output_size,
+            "label": "resource-${env}-" + str(index),
+            "region": "${region}",
+        }
+        if references:
+            properties["inputs"] = [f"${{resource-{parent}.output.id}}" for parent in parents]
+        for pad in range(padding):
+            properties[f"pad_{pad}"] = {"key": f"value-{pad}", "env": "${env}"}
+
+        resource: Dict[str, Any] = {
+            "name": f"resource-{index}",
+            "kind": kind,
+            "metadata": {"index": index},
+            "properties": properties,
+        }
+        if parents:
+            resource["depends_on"] = [f"resource-{parent}" for parent in parents]
+        resources.append(resource)
+
+    return {"name": f"bench-{shape}-{count}", "metadata": {"shape": shape}, "resources": resources}
+
+
+def generate_configuration(env: str = "bench", extra_keys: int = 0) -> Dict[str, Any]:
+    config = {"env": env, "region": "us-east-1"}
+    for index in range(extra_keys):
+        config[f"key_{index}"] = f"value-{index}"
+    return {"config": config}
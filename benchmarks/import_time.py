@@ -0,0 +1,75 @@
+"""Import-time regression check for the CLI module.
+
+    python benchmarks/import_time.py [--target 0.05]
+
+Runs `python -X importtime -c "import cli"` a few times and reports the best cumulative
+import time of `cli`, plus any heavy dependency that got imported eagerly. Exits with
+status 1 when the target is missed or a heavy dependency shows up.
+"""
+
+import argparse
+import json
+from pathlib import Path
+import subprocess
+import sys
+from typing import Any, Dict
+
+SOURCE_DIR = Path(__file__).resolve().parent.parent / "src" / "devex_worker"
+
+TARGET_SECONDS = 0.05
+
+# Modules that only specific subcommands need; importing the CLI must not pull them in.
+LAZY_MODULES = (
+    "worker_daemon",
+    "deployment_execution",
+    "plugin_executor",
+    "requests",
+    "yaml",
+    "loguru",
+    "jinja2",
+)
+
+
+def measure(repeat: int = 5, target_seconds: float = TARGET_SECONDS) -> Dict[str, Any]:
+    timings = []
+    imported = set()
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import cli"],
+            cwd=SOURCE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        for line in completed.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, module = line.split("|")
+            module = module.strip()
+            imported.add(module)
+            if module == "cli":
+                timings.append(int(cumulative) / 1_000_000)
+
+    eager_modules = sorted(module for module in LAZY_MODULES if module in imported)
+    import_seconds = min(timings)
+    return {
+        "import_seconds": import_seconds,
+        "target_seconds": target_seconds,
+        "within_target": import_seconds <= target_seconds and not eager_modules,
+        "eager_modules": eager_modules,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI import-time regression check")
+    parser.add_argument("--target", type=float, default=TARGET_SECONDS, help="Maximum import time in seconds")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    result = measure(args.repeat, args.target)
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result["within_target"] else 1)
+
+
+if __name__ == "__main__":
+    main()
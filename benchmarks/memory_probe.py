@@ -0,0 +1,148 @@
+"""Measure peak RSS of one deployment in a fresh interpreter and print it as JSON.
+
+Plugins run in-process (see `InProcessPluginExecutor`) so thousands of resources can be
+executed without paying for thousands of subprocesses. The RSS high-water mark is reset once
+the document is loaded and merged, so `peak_rss_bytes` is the peak reached while the executor
+runs (on Linux; elsewhere it is the peak of the whole process, see `peak_rss_scope`). The
+`execution_*` figures are traced allocations made while the executor runs.
+"""
+
+import argparse
+from contextlib import contextmanager, redirect_stdout
+import json
+import os
+from pathlib import Path
+import resource
+import sys
+import time
+import tracemalloc
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src" / "devex_worker"))
+
+from loguru import logger  # noqa: E402
+import yaml  # noqa: E402
+
+from deployment_execution import DeploymentExecution  # noqa: E402
+from generators import generate_application, generate_configuration  # noqa: E402
+from services.application_service import Application  # noqa: E402
+from services.configuration_service import Configuration  # noqa: E402
+from services.deployment_service import Deployment  # noqa: E402
+
+
+class InProcessPluginExecutor:
+    """Drop-in for `PluginExecutor` that behaves like the synthetic plugin without a subprocess."""
+
+    def __init__(self, entrypoint, workdir, env=None):
+        self.workdir = Path(workdir)
+
+    @contextmanager
+    def plan(self):
+        yield self
+
+    @contextmanager
+    def deploy(self):
+        yield self
+
+    def read_stdout(self):
+        return iter(())
+
+    def output(self):
+        spec = yaml.safe_load((self.workdir / "resource.yaml").read_text())
+        return {"id": spec["name"], "value": "x" * int(spec["properties"].get("output_size", 0))}
+
+
+def proc_status_bytes(field: str) -> Optional[int]:
+    """Read a `kB` field such as `VmRSS` or `VmHWM` from /proc/self/status, if there is one."""
+    try:
+        with open("/proc/self/status", "r") as file:
+            for line in file:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss() -> bool:
+    """Reset the RSS high-water mark (`VmHWM`) of this process. Only supported on Linux."""
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+    except OSError:
+        return False
+    return proc_status_bytes("VmHWM") is not None
+
+
+def current_rss_bytes() -> int:
+    rss = proc_status_bytes("VmRSS")
+    return rss if rss is not None else peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    hwm = proc_status_bytes("VmHWM")
+    if hwm is not None:
+        return hwm
+
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak RSS of a single deployment")
+    parser.add_argument("--resources", type=int, default=5000)
+    parser.add_argument("--shape", default="dag")
+    parser.add_argument("--output-size", type=int, default=1024)
+    args = parser.parse_args()
+
+    logger.remove()
+
+    application = Application(
+        id="bench",
+        name="bench",
+        definition=yaml.dump(generate_application(args.resources, args.shape, output_size=args.output_size)),
+    )
+    configuration = Configuration(definition=yaml.dump(generate_configuration()))
+    execution = DeploymentExecution(
+        plugins={"synthetic": "in-process"},
+        application=application,
+        configuration=configuration,
+        deployment=Deployment(id="memory-probe"),
+        plan_only=False,
+    )
+    execution.plugin_executor_class = InProcessPluginExecutor
+    execution.merge_definition_and_configuration()
+    load_peak = peak_rss_bytes()
+    baseline = current_rss_bytes()
+    peak_rss_scope = "execution" if reset_peak_rss() else "process"
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        execution.run()
+    elapsed = time.perf_counter() - started
+    peak_rss = peak_rss_bytes()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        json.dumps(
+            {
+                "status": execution.deployment_status,
+                "load_peak_rss_bytes": load_peak,
+                "baseline_rss_bytes": baseline,
+                "peak_rss_bytes": peak_rss,
+                "peak_rss_scope": peak_rss_scope,
+                "execution_rss_growth_bytes": peak_rss - baseline,
+                "execution_peak_bytes": peak,
+                "execution_retained_bytes": retained,
+                "retained_outputs": len(execution.resource_outputs),
+                "wall_seconds": elapsed,
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import argparse
+import json
+import sys
+import time
+
+import yaml
+
+
+class ResourceHandler:
+    """Plugin without side effects whose cost is driven by the resource properties.
+
+    Supported properties:
+      plan_latency_ms  -- time spent in the 'plan' stage
+      latency_ms       -- time spent in the 'deploy' stage
+      output_size      -- number of characters in the 'value' output field
+      fail_on          -- actions that exit with status 1 instead of running
+    """
+
+    KIND = "synthetic"
+
+    def __init__(self, resource):
+        self.resource = resource
+        self.properties = resource.get("properties") or {}
+
+    def fail_if_requested(self, action):
+        if action in (self.properties.get("fail_on") or []):
+            print(f"Failing '{action}' of {self.resource['name']} as requested")
+            sys.exit(1)
+
+    def plan(self):
+        time.sleep(float(self.properties.get("plan_latency_ms", 0)) / 1000)
+        print(f"Plan: 1 to add, 0 to change, 0 to destroy. ({self.resource['name']})")
+
+    def deploy(self):
+        time.sleep(float(self.properties.get("latency_ms", 0)) / 1000)
+        print(f"Deployed {self.resource['name']}")
+
+    def output(self):
+        return {
+            "id": self.resource["name"],
+            "value": "x" * int(self.properties.get("output_size", 0)),
+        }
+
+    def destroy(self):
+        time.sleep(float(self.properties.get("latency_ms", 0)) / 1000)
+        print(f"Destroyed {self.resource['name']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic Resource Handler")
+    parser.add_argument("action", choices=["plan", "deploy", "output", "destroy"], help="Action to perform")
+    parser.add_argument("resource", type=str, help="Path to the resource YAML file")
+
+    args = parser.parse_args()
+
+    with open(args.resource, "r") as f:
+        resource = yaml.safe_load(f)
+
+    handler = ResourceHandler(resource)
+    handler.fail_if_requested(args.action)
+
+    if args.action == "plan":
+        handler.plan()
+    elif args.action == "deploy":
+        handler.deploy()
+    elif args.action == "output":
+        print(json.dumps(handler.output()))
+    elif args.action == "destroy":
+        handler.destroy()
@@ -0,0 +1,83 @@
+"""Run the benchmark suite and write the results as JSON.
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --quick --scenario makespan
+    python benchmarks/compare.py baseline.json results.json
+"""
+
+import argparse
+from contextlib import redirect_stdout
+import json
+import os
+from pathlib import Path
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src" / "devex_worker"))
+
+from loguru import logger  # noqa: E402
+
+from scenarios import REPO_ROOT, default_matrix  # noqa: E402
+
+SCHEMA_VERSION = 1
+
+
+def environment():
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "git_revision": revision,
+        "timestamp": int(time.time()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DevEx worker benchmarks")
+    parser.add_argument("--scenario", action="append", help="Only run the given scenario (repeatable)")
+    parser.add_argument("--quick", action="store_true", help="Use small sizes, for smoke testing")
+    parser.add_argument("--output", default="-", help="Result file, '-' for stdout")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    results = []
+    for name, scenario, params in default_matrix(args.quick):
+        if args.scenario and name not in args.scenario:
+            continue
+
+        print(f"Running {name} {json.dumps(params, sort_keys=True)}", file=sys.stderr)
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory(prefix="devex-bench-") as workdir:
+            os.chdir(workdir)
+            try:
+                with redirect_stdout(sys.stderr):
+                    measured = scenario(Path(workdir), **params)
+            finally:
+                os.chdir(cwd)
+        results.append({"scenario": name, "params": params, "metrics": measured})
+
+    document = json.dumps(
+        {"schema_version": SCHEMA_VERSION, "environment": environment(), "results": results},
+        indent=2,
+        sort_keys=True,
+    )
+    if args.output == "-":
+        print(document)
+    else:
+        Path(args.output).write_text(document + "\n")
+
+
+if __name__ == "__main__":
+    main()
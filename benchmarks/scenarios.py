@@ -0,0 +1,292 @@
+import json
+import os
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict
+
+import yaml
+
+from generators import generate_application, generate_configuration
+from stub_api import StubAPI
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SOURCE_DIR = REPO_ROOT / "src" / "devex_worker"
+PLUGINS_DIR = Path(__file__).resolve().parent / "plugins"
+
+
+def makespan(workdir: Path, resources: int, shape: str, latency_ms: float, output_size: int) -> Dict[str, Any]:
+    """Wall time of one local deployment (plan + deploy + output for every resource)."""
+    from worker_daemon import WorkerDaemon
+
+    application_file = workdir / "application.yaml"
+    configuration_file = workdir / "configuration.yaml"
+    application_file.write_text(
+        yaml.dump(generate_application(resources, shape, latency_ms=latency_ms, output_size=output_size))
+    )
+    configuration_file.write_text(yaml.dump(generate_configuration()))
+
+    worker = WorkerDaemon(
+        application_file=str(application_file),
+        configuration_file=str(configuration_file),
+        plugins_dir=PLUGINS_DIR,
+    )
+    started = time.perf_counter()
+    status = worker.run()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "status": status,
+        "makespan_seconds": elapsed,
+        "resources_per_second": resources / elapsed,
+    }
+
+
+def teardown(workdir: Path, resources: int, shape: str, latency_ms: float, concurrency: int) -> Dict[str, Any]:
+    """Wall time of destroying a deployed application by walking its dependency graph in reverse."""
+    from worker_daemon import WorkerDaemon
+
+    application_file = workdir / "application.yaml"
+    configuration_file = workdir / "configuration.yaml"
+    application_file.write_text(yaml.dump(generate_application(resources, shape, latency_ms=latency_ms)))
+    configuration_file.write_text(yaml.dump(generate_configuration()))
+
+    def worker():
+        return WorkerDaemon(
+            application_file=str(application_file),
+            configuration_file=str(configuration_file),
+            plugins_dir=PLUGINS_DIR,
+            deployment_id="teardown",
+        )
+
+    deploy_status = worker().run()
+    started = time.perf_counter()
+    status = worker().destroy(max_workers=concurrency)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "deploy_status": deploy_status,
+        "status": status,
+        "teardown_seconds": elapsed,
+        "resources_per_second": resources / elapsed,
+    }
+
+
+def daemon_throughput(
+    workdir: Path, deployments: int, resources: int, shape: str, latency_ms: float, poll_seconds: float
+) -> Dict[str, Any]:
+    """Drain `deployments` pending API-backed deployments through `WorkerDaemon.schedule`.
+
+    Uses the daemon's own scheduling pass, including its cap on concurrent workers; only the
+    10 second sleep between polls is replaced by `poll_seconds`.
+    """
+    import session
+    from services.deployment_service import DeploymentService
+    from worker_daemon import WorkerDaemon
+
+    with StubAPI() as api:
+        application_id = api.add_application(generate_application(resources, shape, latency_ms=latency_ms))
+        configuration_id = api.add_configuration(application_id, generate_configuration())
+        for _ in range(deployments):
+            api.add_deployment(application_id, configuration_id)
+
+        token_file = session.TOKEN_FILE
+        session.TOKEN_FILE = str(workdir / "token")
+        try:
+            stub_session = session.Session(api.url)
+            stub_session.token = "stub-token"
+            stub_session.save_token()
+
+            deployment_service = DeploymentService(session=stub_session)
+            active_threads, scheduled_deployments = [], []
+            peak_concurrency = 0
+            started = time.perf_counter()
+            while True:
+                active_threads = WorkerDaemon.schedule(
+                    deployment_service, active_threads, scheduled_deployments, plugins_dir=PLUGINS_DIR
+                )
+                peak_concurrency = max(peak_concurrency, len(active_threads))
+                with api.lock:
+                    pending = [d for d in api.data["deployments"].values() if d["state"] == "pending"]
+                if not pending and not active_threads:
+                    break
+                time.sleep(poll_seconds)
+            elapsed = time.perf_counter() - started
+        finally:
+            session.TOKEN_FILE = token_file
+
+        states = [deployment["state"] for deployment in api.data["deployments"].values()]
+        return {
+            "deployed": states.count("deployed"),
+            "failed": states.count("failed"),
+            "peak_concurrency": peak_concurrency,
+            "wall_seconds": elapsed,
+            "deployments_per_second": deployments / elapsed,
+            "api_requests": api.request_count,
+        }
+
+
+def plan_matrix(workdir: Path, environments: int, resources: int, plan_latency_ms: float) -> Dict[str, Any]:
+    """Cost of planning one application against several environments compared to a single plan."""
+    from worker_daemon import WorkerDaemon
+
+    application_file = workdir / "application.yaml"
+    application_file.write_text(yaml.dump(generate_application(resources, "dag", plan_latency_ms=plan_latency_ms)))
+    configuration_files = []
+    for index in range(environments):
+        configuration_file = workdir / f"env-{index}.yaml"
+        configuration_file.write_text(yaml.dump(generate_configuration(env=f"env-{index}")))
+        configuration_files.append(str(configuration_file))
+
+    timings = {}
+    for name, files in (("single", configuration_files[:1]), ("matrix", configuration_files)):
+        worker = WorkerDaemon(application_file=str(application_file), plugins_dir=PLUGINS_DIR)
+        started = time.perf_counter()
+        report = worker.plan_matrix(files)
+        timings[name] = time.perf_counter() - started
+
+    return {
+        "planned": sum(result["status"] == "planned" for result in report["environments"].values()),
+        "single_plan_seconds": timings["single"],
+        "matrix_seconds": timings["matrix"],
+        "matrix_to_single_ratio": timings["matrix"] / timings["single"],
+    }
+
+
+def interpolation(workdir: Path, resources: int, padding: int, config_keys: int) -> Dict[str, Any]:
+    """Cost of YAML round trips, configuration merging and reference resolution for a large document."""
+    from deployment_execution import DeploymentExecution
+    from services.application_service import Application
+    from services.configuration_service import Configuration
+    from services.deployment_service import Deployment
+
+    definition = generate_application(resources, "dag", padding=padding)
+
+    started = time.perf_counter()
+    document = yaml.dump(definition)
+    yaml_dump_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    yaml.safe_load(document)
+    yaml_load_seconds = time.perf_counter() - started
+
+    application = Application(id="bench", name="bench")
+    application.definition = definition
+    configuration = Configuration()
+    configuration.definition = generate_configuration(extra_keys=config_keys)
+    execution = DeploymentExecution(
+        plugins={},
+        application=application,
+        configuration=configuration,
+        deployment=Deployment(id="bench"),
+        plan_only=True,
+    )
+
+    started = time.perf_counter()
+    execution.merge_definition_and_configuration()
+    merge_seconds = time.perf_counter() - started
+
+    for resource in execution.application.resources:
+        execution.resource_specs[resource["name"]] = resource
+        execution.resource_outputs[resource["name"]] = {"id": resource["name"]}
+
+    started = time.perf_counter()
+    for resource in execution.application.resources:
+        execution.resolve_references(resource)
+    resolve_seconds = time.perf_counter() - started
+
+    return {
+        "document_bytes": len(document),
+        "yaml_dump_seconds": yaml_dump_seconds,
+        "yaml_load_seconds": yaml_load_seconds,
+        "merge_seconds": merge_seconds,
+        "resolve_seconds": resolve_seconds,
+    }
+
+
+def memory(workdir: Path, resources: int, shape: str, output_size: int) -> Dict[str, Any]:
+    """Peak RSS while a full deployment executes, measured in a fresh interpreter by `memory_probe.py`."""
+    completed = subprocess.run(
+        [
+            sys.executable,
+            str(Path(__file__).resolve().parent / "memory_probe.py"),
+            "--resources",
+            str(resources),
+            "--shape",
+            shape,
+            "--output-size",
+            str(output_size),
+        ],
+        cwd=workdir,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout)
+
+
+def cli_startup(workdir: Path, repeat: int) -> Dict[str, Any]:
+    """Wall time of `cli.py --help` in a fresh interpreter."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, str(SOURCE_DIR / "cli.py"), "--help"],
+            cwd=workdir,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+            env=dict(os.environ),
+        )
+        timings.append(time.perf_counter() - started)
+
+    return {
+        "min_seconds": min(timings),
+        "median_seconds": statistics.median(timings),
+    }
+
+
+def cli_import(workdir: Path, repeat: int) -> Dict[str, Any]:
+    """`-X importtime` cumulative import time of the CLI module, checked against its target."""
+    import import_time
+
+    return import_time.measure(repeat)
+
+
+def default_matrix(quick: bool):
+    """Scenario name, function and parameter sets that make up a full run."""
+    sizes = [10] if quick else [25, 100]
+    matrix = []
+    for resources in sizes:
+        for shape in ("chain", "fanout", "dag"):
+            matrix.append(
+                ("makespan", makespan, {"resources": resources, "shape": shape, "latency_ms": 20, "output_size": 64})
+            )
+    for shape in ("chain", "fanout", "dag"):
+        matrix.append(
+            (
+                "teardown",
+                teardown,
+                {"resources": 10 if quick else 50, "shape": shape, "latency_ms": 200, "concurrency": 8},
+            )
+        )
+    for deployments in [1, 4] if quick else [1, 4, 8]:
+        matrix.append(
+            (
+                "daemon_throughput",
+                daemon_throughput,
+                {"deployments": deployments, "resources": 5, "shape": "dag", "latency_ms": 20, "poll_seconds": 0.1},
+            )
+        )
+    matrix.append(
+        ("plan_matrix", plan_matrix, {"environments": 3, "resources": 5 if quick else 20, "plan_latency_ms": 200})
+    )
+    for resources in [200] if quick else [1000, 5000]:
+        matrix.append(("interpolation", interpolation, {"resources": resources, "padding": 10, "config_keys": 50}))
+    for resources in [500] if quick else [5000]:
+        matrix.append(("memory", memory, {"resources": resources, "shape": "dag", "output_size": 1024}))
+    matrix.append(("cli_startup", cli_startup, {"repeat": 3 if quick else 10}))
+    matrix.append(("cli_import", cli_import, {"repeat": 3 if quick else 10}))
+    return matrix
@@ -0,0 +1,145 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+from typing import Any, Dict, Optional
+from uuid import uuid4
+
+import yaml
+
+
+class StubAPI:
+    """In-memory stand-in for the `/api` endpoints used by `Session` and `BaseAPI`.
+
+    Serves `login/`, `applications`, `configurations` and `deployments` collections on a
+    random local port and counts the requests it receives.
+    """
+
+    COLLECTIONS = ("applications", "configurations", "deployments")
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.lock = threading.Lock()
+        self.data: Dict[str, Dict[str, Dict[str, Any]]] = {name: {} for name in StubAPI.COLLECTIONS}
+        self.request_count = 0
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+        return False
+
+    def add_application(self, definition: Dict[str, Any], name: str = "bench", version: str = "1") -> str:
+        id = str(uuid4())
+        self.data["applications"][id] = {
+            "id": id,
+            "name": name,
+            "version": version,
+            "definition": yaml.dump(definition),
+        }
+        return id
+
+    def add_configuration(self, application_id: str, definition: Dict[str, Any], name: str = "bench") -> str:
+        id = str(uuid4())
+        self.data["configurations"][id] = {
+            "id": id,
+            "application_id": application_id,
+            "name": name,
+            "version": "1",
+            "definition": yaml.dump(definition),
+            "created": None,
+            "updated": None,
+        }
+        return id
+
+    def add_deployment(self, application_id: str, configuration_id: str, state: str = "pending") -> str:
+        id = str(uuid4())
+        self.data["deployments"][id] = {
+            "id": id,
+            "application_id": application_id,
+            "configuration_id": configuration_id,
+            "configuration_version": "1",
+            "state": state,
+            "created": None,
+            "updated": None,
+        }
+        return id
+
+    def _handler_class(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                collection, id = self._route()
+                if collection not in api.data:
+                    return self._reply(404, {"detail": "Not found"})
+
+                with api.lock:
+                    if id is None:
+                        return self._reply(200, list(api.data[collection].values()))
+                    item = api.data[collection].get(id)
+                self._reply(200, item) if item else self._reply(404, {"detail": "Not found"})
+
+            def do_POST(self):
+                collection, _ = self._route()
+                body = self._body()
+                if collection == "login":
+                    return self._reply(200, {"tokens": {"access": "stub-token", "refresh": "stub-token"}})
+                if collection not in api.data:
+                    return self._reply(404, {"detail": "Not found"})
+
+                body.setdefault("id", str(uuid4()))
+                with api.lock:
+                    api.data[collection][body["id"]] = body
+                self._reply(201, body)
+
+            def do_PUT(self):
+                collection, id = self._route()
+                with api.lock:
+                    item = api.data.get(collection, {}).get(id)
+                    if item is None:
+                        return self._reply(404, {"detail": "Not found"})
+                    item.update(self._body())
+                self._reply(200, item)
+
+            def do_DELETE(self):
+                collection, id = self._route()
+                with api.lock:
+                    deleted = api.data.get(collection, {}).pop(id, None)
+                self._reply(204 if deleted else 404, None)
+
+            def _route(self):
+                with api.lock:
+                    api.request_count += 1
+                parts = [part for part in self.path.split("?")[0].split("/") if part]
+                if parts[:1] == ["api"]:
+                    parts = parts[1:]
+                collection = parts[0] if parts else ""
+                id = parts[1] if len(parts) > 1 else None
+                return collection, id
+
+            def _body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length)) if length else {}
+
+            def _reply(self, status, payload):
+                body = b"" if payload is None else json.dumps(payload, default=str).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
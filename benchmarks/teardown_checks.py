@@ -0,0 +1,191 @@
+"""Behaviour checks for the reverse-DAG teardown.
+
+    python benchmarks/teardown_checks.py [--check reverse_order]
+
+Deploys small applications with the `synthetic` plugin (whose `fail_on` property makes a
+stage fail), tears them down and checks the outcome of every resource. Each check runs in
+its own temporary working directory. Exits with status 1 when any check fails.
+"""
+
+import argparse
+from contextlib import redirect_stdout
+import os
+from pathlib import Path
+import sys
+import tempfile
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src" / "devex_worker"))
+
+from loguru import logger  # noqa: E402
+import yaml  # noqa: E402
+
+from deployment_execution import DeploymentExecution  # noqa: E402
+from generators import dependency_graph, generate_application, generate_configuration  # noqa: E402
+from services.application_service import Application  # noqa: E402
+from services.configuration_service import Configuration  # noqa: E402
+from services.deployment_service import Deployment  # noqa: E402
+
+PLUGINS_DIR = Path(__file__).resolve().parent / "plugins"
+PLUGINS = {"synthetic": PLUGINS_DIR / "synthetic" / "plugin.sh"}
+
+
+def resource(name: str, depends_on: List[str] = (), kind: str = "synthetic", **properties) -> Dict[str, Any]:
+    spec: Dict[str, Any] = {"name": name, "kind": kind, "properties": properties}
+    if depends_on:
+        spec["depends_on"] = list(depends_on)
+    return spec
+
+
+def execute(action: str, resources: List[Dict[str, Any]], deployment_id: str = "check") -> DeploymentExecution:
+    """Run `action` ('run' or 'destroy') for an application made of `resources`."""
+    application = Application(
+        id="check", name="check", definition=yaml.dump({"name": "check", "metadata": {}, "resources": resources})
+    )
+    execution = DeploymentExecution(
+        plugins=PLUGINS,
+        application=application,
+        configuration=Configuration(definition=yaml.dump(generate_configuration())),
+        deployment=Deployment(id=deployment_id),
+        plan_only=False,
+        capture_output=True,
+    )
+    execution.merge_definition_and_configuration()
+    getattr(execution, action)()
+    return execution
+
+
+def statuses(execution: DeploymentExecution) -> Dict[str, str]:
+    return {name: status.status for name, status in execution.resource_deployment_status.items()}
+
+
+def destroyed(execution: DeploymentExecution) -> List[str]:
+    """Resources whose plugin ran 'destroy', in the order they finished."""
+    prefix = "Destroyed "
+    return [line[len(prefix) :] for _, line in execution.execution_stdout if line.startswith(prefix)]
+
+
+def check_reverse_order():
+    """Every resource is destroyed after all of the resources that depend on it."""
+    application = generate_application(15, "dag")
+    assert execute("run", application["resources"]).deployment_status == "deployed"
+
+    execution = execute("destroy", application["resources"])
+    assert execution.teardown_status == "destroyed", statuses(execution)
+    order = destroyed(execution)
+    assert sorted(order) == sorted(resource["name"] for resource in application["resources"]), order
+    for index, parents in enumerate(dependency_graph(15, "dag")):
+        for parent in parents:
+            assert order.index(f"resource-{parent}") > order.index(f"resource-{index}"), (parent, index, order)
+
+
+def check_failed_destroy_keeps_dependencies():
+    """When `b` fails to be destroyed, `c` (which depends on it) is gone but `a` is left in place."""
+    resources = [resource("a"), resource("b", ["a"], fail_on=["destroy"]), resource("c", ["b"])]
+    assert execute("run", resources).deployment_status == "deployed"
+
+    execution = execute("destroy", resources)
+    assert statuses(execution) == {"a": "FAILED", "b": "FAILED", "c": "DESTROYED"}, statuses(execution)
+    assert execution.resource_deployment_status["a"].reason == "Dependent resource failed to destroy"
+    assert destroyed(execution) == ["c"], destroyed(execution)
+    assert execution.teardown_status == "destroy_failed"
+
+
+def check_dependency_cycle():
+    """Resources in, or behind, a dependency cycle are never destroyed; the rest still are."""
+    resources = [resource("v"), resource("x", ["v"]), resource("y", ["x"]), resource("z", ["x"])]
+    assert execute("run", resources).deployment_status == "deployed"
+
+    resources[1]["depends_on"].append("y")
+    execution = execute("destroy", resources)
+    assert statuses(execution) == {"v": "FAILED", "x": "FAILED", "y": "FAILED", "z": "DESTROYED"}, statuses(execution)
+    for name in ("v", "x", "y"):
+        assert execution.resource_deployment_status[name].reason == "Dependency cycle between resources"
+    assert destroyed(execution) == ["z"], destroyed(execution)
+
+
+def check_never_deployed_is_skipped():
+    """Resources the deploy run gave up on are skipped, so the resources they depend on can go."""
+    resources = [
+        resource("a"),
+        resource("b", ["a"], kind="missing"),
+        resource("c", ["b"], input="${b.output.id}"),
+    ]
+    assert execute("run", resources).deployment_status == "failed"
+
+    execution = execute("destroy", resources)
+    assert execution.teardown_status == "destroyed", statuses(execution)
+    assert execution.resource_deployment_status["b"].reason == "Resource was never deployed"
+    assert execution.resource_deployment_status["c"].reason == "Resource was never deployed"
+    assert destroyed(execution) == ["a"], destroyed(execution)
+
+
+def check_missing_record_fails():
+    """A resource without any record in the execution folder is not assumed to be gone."""
+    assert execute("run", [resource("a")]).deployment_status == "deployed"
+
+    execution = execute("destroy", [resource("a"), resource("added-later", ["a"])])
+    assert statuses(execution) == {"a": "FAILED", "added-later": "FAILED"}, statuses(execution)
+    assert execution.resource_deployment_status["added-later"].reason == "No deployment record for resource"
+    assert destroyed(execution) == []
+
+
+def check_missing_execution_folder_fails():
+    """Tearing down a deployment that has no execution folder here fails without creating one."""
+    from worker_daemon import WorkerDaemon
+
+    Path("application.yaml").write_text(yaml.dump(generate_application(3, "chain")))
+    Path("configuration.yaml").write_text(yaml.dump(generate_configuration()))
+    worker = WorkerDaemon(
+        application_file="application.yaml",
+        configuration_file="configuration.yaml",
+        plugins_dir=PLUGINS_DIR,
+        deployment_id="typo-id",
+    )
+    assert worker.destroy() == "destroy_failed"
+    assert not Path(".devex-runner/executions/typo-id").exists()
+
+
+def check_orphans_are_destroyed():
+    """Resources removed from the definition after they were deployed are torn down too."""
+    resources = [resource("a"), resource("b", ["a"]), resource("c", ["b"])]
+    assert execute("run", resources).deployment_status == "deployed"
+
+    execution = execute("destroy", resources[:1])
+    assert statuses(execution) == {"a": "DESTROYED", "b": "DESTROYED", "c": "DESTROYED"}, statuses(execution)
+    assert destroyed(execution) == ["c", "b", "a"], destroyed(execution)
+
+
+CHECKS = {name[len("check_") :]: check for name, check in globals().items() if name.startswith("check_")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teardown behaviour checks")
+    parser.add_argument("--check", action="append", choices=sorted(CHECKS), help="Only run the given check (repeatable)")
+    args = parser.parse_args()
+
+    logger.remove()
+
+    failures = 0
+    for name, check in CHECKS.items():
+        if args.check and name not in args.check:
+            continue
+
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory(prefix="devex-check-") as workdir:
+            os.chdir(workdir)
+            try:
+                with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                    check()
+                print(f"PASS {name}")
+            except Exception as exc:
+                failures += 1
+                print(f"FAIL {name}: {exc!r}")
+            finally:
+                os.chdir(cwd)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
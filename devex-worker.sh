@@ -1,3 +1,9 @@
 #!/bin/bash
 
+# Prefer the installed console script: it skips the `uv run` environment resolution
+# that otherwise runs on every call.
+if [ -x "$(dirname $0)/.venv/bin/devex-worker" ]; then
+    exec "$(dirname $0)/.venv/bin/devex-worker" "$@"
+fi
+
 uv run python3 src/devex_worker/cli.py $@
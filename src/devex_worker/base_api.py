@@ -2,6 +2,7 @@ from typing import Any, Dict, List, Optional
 from loguru import logger
 import requests
 
+from instrumentation import metrics
 from session import Session
 
 
@@ -13,20 +14,26 @@ class BaseAPI:
         self.headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
         self.service_url = ""
 
+    def _request(self, method, url, **kwargs) -> requests.Response:
+        with metrics.timer("api_request_seconds", method=method):
+            response = requests.request(method, url, headers=self.headers, **kwargs)
+        metrics.increment("api_requests_total", method=method, status=response.status_code)
+        return response
+
     def get_all(self) -> Optional[List[Dict[str, Dict[str, Any]]]]:
-        response = requests.get(f"{self.service_url}", headers=self.headers)
+        response = self._request("GET", f"{self.service_url}")
         return response.json() if response.status_code == 200 else None
 
     def get(self, id) -> Optional[Dict[str, Dict[str, Any]]]:
-        response = requests.get(f"{self.service_url}/{id}", headers=self.headers)
+        response = self._request("GET", f"{self.service_url}/{id}")
         return response.json() if response.status_code == 200 else None
 
     def create(self, id, data) -> Optional[Dict[str, Dict[str, Any]]]:
-        response = requests.post(f"{self.service_url}", json=data, headers=self.headers)
+        response = self._request("POST", f"{self.service_url}", json=data)
         return response.json() if response.status_code in [200, 201] else None
 
     def update(self, id, data) -> Optional[Dict[str, Dict[str, Any]]]:
-        response = requests.put(f"{self.service_url}/{id}/", json=data, headers=self.headers)
+        response = self._request("PUT", f"{self.service_url}/{id}/", json=data)
         if response.status_code == 200:
             return response.json()
         else:
@@ -35,5 +42,5 @@ class BaseAPI:
             )
 
     def delete(self, id) -> bool:
-        response = requests.delete(f"{self.service_url}/{id}", headers=self.headers)
+        response = self._request("DELETE", f"{self.service_url}/{id}")
         return response.status_code == 204
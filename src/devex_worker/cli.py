@@ -1,15 +1,18 @@
 import click
-from services.application_service import ApplicationService
-from worker_daemon import WorkerDaemon
-from session import Session
+
+# Subcommands import their dependencies when they run so that `--help`, `login` and
+# `applications` do not pay for the executor, yaml, jinja2 and loguru at startup.
 
 API_BASE_URL = "http://localhost:8000/api"
 
 
 @click.command()
-def run_as_daemon():
+@click.option("--metrics-port", type=int, default=None, help="Expose Prometheus metrics on this local port")
+def run_as_daemon(metrics_port):
     """Worker Daemon for Resource Management"""
-    WorkerDaemon.start()
+    from worker_daemon import WorkerDaemon
+
+    WorkerDaemon.start(metrics_port=metrics_port)
 
 
 @click.command()
@@ -17,6 +20,7 @@ def run_as_daemon():
 @click.option("-e", "--url", default=API_BASE_URL, required=True, type=str)
 def login(username, url):
     """Login to the API and save token"""
+    from session import Session
 
     if username is None:
         username = click.prompt("Username", type=str)
@@ -31,14 +35,86 @@ def login(username, url):
 @click.option("-a", "--application", type=click.Path(exists=True), required=True)
 @click.option("-c", "--configuration", type=click.Path(exists=True), required=True)
 @click.option("--plan", is_flag=True, default=False)
-def deploy(application, configuration, plan):
+@click.option("--deployment-id", default=None, help="Reuse the execution folder of an earlier local run")
+@click.option("--metrics", "show_metrics", is_flag=True, default=False, help="Print a JSON metrics summary at the end")
+def deploy(application, configuration, plan, deployment_id, show_metrics):
     """Deploy an application"""
+    import json
+    from instrumentation import metrics
+    from worker_daemon import WorkerDaemon
+
+    if show_metrics:
+        metrics.enable()
+
     worker = WorkerDaemon(
         application_file=application,
         configuration_file=configuration,
+        deployment_id=deployment_id,
     )
     worker.run(plan_only=plan)
 
+    if show_metrics:
+        click.echo(json.dumps(metrics.summary(), indent=2))
+
+
+@click.command()
+@click.option("-a", "--application", type=click.Path(exists=True), required=True)
+@click.option("-c", "--configuration", type=click.Path(exists=True), required=True)
+@click.option("--deployment-id", required=True, help="Id of the local deployment to tear down")
+@click.option("--concurrency", type=int, default=None, help="Maximum number of resources destroyed at once")
+@click.option("--metrics", "show_metrics", is_flag=True, default=False, help="Print a JSON metrics summary at the end")
+def destroy(application, configuration, deployment_id, concurrency, show_metrics):
+    """Destroy a deployed application"""
+    import json
+    from instrumentation import metrics
+    from worker_daemon import WorkerDaemon
+
+    if show_metrics:
+        metrics.enable()
+
+    worker = WorkerDaemon(
+        application_file=application,
+        configuration_file=configuration,
+        deployment_id=deployment_id,
+    )
+    status = worker.destroy(max_workers=concurrency)
+
+    if show_metrics:
+        click.echo(json.dumps(metrics.summary(), indent=2))
+
+    if status != "destroyed":
+        raise SystemExit(1)
+
+
+@click.command()
+@click.option("-a", "--application", type=click.Path(exists=True), required=True)
+@click.option(
+    "-c",
+    "--configuration",
+    "configurations",
+    type=click.Path(exists=True),
+    required=True,
+    multiple=True,
+    help="Configuration file of one environment (repeatable)",
+)
+@click.option("-o", "--output", type=click.Path(), default=None, help="Also write the report as JSON to this file")
+def plan_matrix(application, configurations, output):
+    """Plan an application against several configurations at once"""
+    import json
+    from plan_matrix import render_report
+    from worker_daemon import WorkerDaemon
+
+    worker = WorkerDaemon(application_file=application)
+    report = worker.plan_matrix(configurations)
+
+    click.echo(render_report(report))
+    if output:
+        with open(output, "w") as file:
+            json.dump(report, file, indent=2, default=str)
+
+    if any(environment["status"] != "planned" for environment in report["environments"].values()):
+        raise SystemExit(1)
+
 
 @click.group()
 def cli():
@@ -54,6 +130,9 @@ def applications():
 @click.command()
 def list():
     """List all applications"""
+    from services.application_service import ApplicationService
+    from session import Session
+
     api = ApplicationService(session=Session.load_session())
     applications = api.get_applications()
     if applications:
@@ -67,6 +146,8 @@ applications.add_command(list)
 cli.add_command(run_as_daemon)
 cli.add_command(login)
 cli.add_command(deploy)
+cli.add_command(destroy)
+cli.add_command(plan_matrix)
 cli.add_command(applications)
 
 
@@ -1,58 +1,126 @@
-import copy
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from functools import cached_property
 from pathlib import Path
 from queue import Queue
 import time
+from typing import Any, Dict, List, Optional
 from loguru import logger
 import yaml
-import re
 from services.application_service import Application
 from services.configuration_service import Configuration
 from services.deployment_service import Deployment
+from instrumentation import metrics
 from plugin_executor import PluginExecutor
+from reference_analysis import REFERENCE_PATTERN, ReferenceAnalysis, parse_reference
+
+# Stands in for output references in plan-only runs, where producers are never deployed
+KNOWN_AFTER_APPLY = "(known after apply)"
+
+# Written to a resource's workdir when a run gives up on it before its plugin is invoked
+NEVER_APPLIED_FILE = "never-applied"
+
+
+class ResourceStatus:
+    __slots__ = ("status", "reason", "stacktrace")
+
+    def __init__(self, status: str, reason: str = "", stacktrace: Optional[Exception] = None):
+        self.status = status
+        self.reason = reason
+        self.stacktrace = stacktrace
 
 
 class DeploymentExecution:
-    def __init__(self, plugins, application, configuration, deployment, plan_only):
+    plugin_executor_class = PluginExecutor
+
+    def __init__(
+        self,
+        plugins,
+        application,
+        configuration,
+        deployment,
+        plan_only,
+        analysis=None,
+        plugin_env=None,
+        capture_output=False,
+    ):
         self.plugins = plugins
         self.deployment: Deployment = deployment
         self.application: Application = application
         self.configuration: Configuration = configuration
         self.plan_only = plan_only
+        self.plugin_env: Dict[str, str] = plugin_env or {}
+        self.capture_output = capture_output
+        self._analysis: Optional[ReferenceAnalysis] = analysis
 
         self.queue = Queue()
-        self.resource_data = {}
-        self.resource_deployment_status = {}
+        self.resource_specs: Dict[str, Dict[str, Any]] = {}
+        self.resource_outputs: Dict[str, Dict[str, Any]] = {}
+        self.pending_consumers: Dict[str, int] = {}
+        self.resource_deployment_status: Dict[str, ResourceStatus] = {}
         self.execution_stdout = []
         self.execution_stderr = []
 
+    @cached_property
+    def execution_folder(self) -> Path:
+        """Where the deployment keeps its per-resource state; unlike `tmp_folder` it is not created."""
+        return Path().cwd() / f".devex-runner/executions/{self.deployment.id}"
+
     @cached_property
     def tmp_folder(self) -> Path:
-        tmp_path = Path().cwd() / f".devex-runner/executions/{self.deployment.id}"
+        tmp_path = self.execution_folder
         tmp_path.mkdir(parents=True, exist_ok=True)
         return tmp_path
 
+    def resource_workdir(self, resource_name) -> Path:
+        """Working directory of a single resource; keeps plugin state of resources apart."""
+        workdir = self.tmp_folder / resource_name
+        workdir.mkdir(parents=True, exist_ok=True)
+        return workdir
+
+    @property
+    def analysis(self) -> ReferenceAnalysis:
+        """Reference analysis of the (merged) application, computed on first use."""
+        if self._analysis is None:
+            self._analysis = ReferenceAnalysis(self.application.resources)
+        return self._analysis
+
     @property
     def deployment_status(self):
         for resource_status in self.resource_deployment_status.values():
-            if resource_status["status"] == "FAILED":
+            if resource_status.status == "FAILED":
                 return "failed"
 
-            if resource_status["status"] == "PENDING":
+            if resource_status.status == "PENDING":
                 return "pending"
 
         return "deployed"
 
-    def merge_definition_and_configuration(self):
-        """Merge the application definition and configuration."""
-        definition_as_string = yaml.dump(self.application.definition)
+    @property
+    def teardown_status(self):
+        for resource_status in self.resource_deployment_status.values():
+            if resource_status.status != "DESTROYED":
+                return "destroy_failed"
+
+        return "destroyed"
+
+    @metrics.timed("merge_definition_and_configuration_seconds")
+    def merge_definition_and_configuration(self, definition_as_string: Optional[str] = None):
+        """Merge the application definition and configuration.
+
+        `definition_as_string` lets callers that merge one application with several
+        configurations dump the definition once.
+        """
+        if definition_as_string is None:
+            definition_as_string = yaml.dump(self.application.definition)
         for key, value in self.configuration.definition["config"].items():
             definition_as_string = definition_as_string.replace(f"${{{key}}}", value)
         self.application.definition = yaml.safe_load(definition_as_string)
 
     def run(self):
+        self.pending_consumers = dict(self.analysis.consumer_count)
         for resource in self.application.resources:
-            self.resource_deployment_status[resource["name"]] = {"status": "PENDING"}
+            self.resource_specs[resource["name"]] = resource
+            self.resource_deployment_status[resource["name"]] = ResourceStatus("PENDING")
             self.queue.put(resource)
 
         while not self.queue.empty():
@@ -62,101 +130,284 @@ class DeploymentExecution:
 
     def process_resource(self, resource):
         """Process a resource using its respective plugin."""
+        with metrics.timer("resource_seconds", kind=resource["kind"]):
+            self._process_resource(resource)
+
+        self.release_producers(resource["name"])
+        status = self.resource_deployment_status[resource["name"]].status
+        metrics.increment("resources_total", kind=resource["kind"], status=status)
+
+    def _process_resource(self, resource):
         plugin_script = self.plugins.get(resource["kind"])
         resource_name = resource["name"]
 
-        self.resource_data[resource_name] = copy.deepcopy(resource)
-
         if not plugin_script:
-            self.resource_deployment_status[resource_name] = {
-                "status": "FAILED",
-                "reason": "Dependent resource failed to deploy",
-            }
+            self.resource_deployment_status[resource_name] = ResourceStatus(
+                "FAILED", "Dependent resource failed to deploy"
+            )
+            self.mark_never_applied(resource_name, f"No plugin found for {resource['kind']}")
             return
 
         if self.resolve_dependencies(resource) is False:
-            self.resource_deployment_status[resource_name] = {
-                "status": "FAILED",
-                "reason": "Dependent resource failed to deploy",
-            }
+            self.resource_deployment_status[resource_name] = ResourceStatus(
+                "FAILED", "Dependent resource failed to deploy"
+            )
+            self.mark_never_applied(resource_name, "Dependent resource failed to deploy")
             logger.error(f"Failed to process resource: {resource_name}. Reason: Dependent resource failed to deploy")
             return
 
-        resource_yaml_path = self.tmp_folder / "resource.yaml"
-        logger.info(f"Writing resource yaml to {resource_yaml_path}")
-        resource_yaml = self.resolve_references(resource)
-        resource_yaml_path.write_text(yaml.dump(resource_yaml))
+        workdir = self.resource_workdir(resource_name)
+        resource_yaml_path = workdir / "resource.yaml"
 
         try:
-            plugin = PluginExecutor(plugin_script, workdir=self.tmp_folder)
+            with metrics.timer("resolve_references_seconds"):
+                resource_yaml = self.resolve_references(resource)
+        except Exception as exception:
+            self.resource_deployment_status[resource_name] = ResourceStatus(
+                "FAILED", "Failed to resolve references", exception
+            )
+            self.mark_never_applied(resource_name, str(exception))
+            logger.exception(f"[{resource_name}] Failed to resolve references", exception)
+            return
+
+        try:
+            logger.info(f"Writing resource yaml to {resource_yaml_path}")
+            (workdir / NEVER_APPLIED_FILE).unlink(missing_ok=True)
+            resource_yaml_path.write_text(yaml.dump(resource_yaml))
+
+            plugin = self.plugin_executor_class(plugin_script, workdir=workdir, env=self.plugin_env)
             with plugin.plan() as process:
                 for line in process.read_stdout():
-                    print(line)
+                    self.echo(resource_name, line)
 
             if self.plan_only is False:
                 with plugin.deploy() as process:
                     for line in process.read_stdout():
-                        print(line)
+                        self.echo(resource_name, line)
 
-                self.resource_data[resource_name]["output"] = plugin.output()
+                retained_fields = self.analysis.retained_fields.get(resource_name)
+                if retained_fields:
+                    output = plugin.output()
+                    self.resource_outputs[resource_name] = {
+                        field_name: output[field_name] for field_name in retained_fields if field_name in output
+                    }
 
-            self.resource_deployment_status[resource_name] = {
-                "status": "DEPLOYED",
-                "reason": "Resource deployed successfully",
-            }
+            self.resource_deployment_status[resource_name] = ResourceStatus(
+                "DEPLOYED", "Resource deployed successfully"
+            )
         except Exception as exception:
-            self.resource_deployment_status[resource_name] = {
-                "status": "FAILED",
-                "reason": "Failed to process resource",
-                "stacktrace": exception,
-            }
+            self.resource_deployment_status[resource_name] = ResourceStatus(
+                "FAILED", "Failed to process resource", exception
+            )
             logger.exception(f"[{resource_name}] Failed to process resource", exception)
 
+    def mark_never_applied(self, resource_name, reason):
+        """Record that this run gave up on a resource before its plugin was invoked, so that
+        teardown can tell it apart from a resource whose state is simply missing."""
+        (self.resource_workdir(resource_name) / NEVER_APPLIED_FILE).write_text(f"{reason}\n")
+
+    @cached_property
+    def orphaned_resources(self) -> List[Dict[str, Any]]:
+        """Resources applied in the execution folder that are no longer in the application.
+
+        Read back from the `resource.yaml` the plugin applied, so their kind and `depends_on`
+        are the ones they were deployed with.
+        """
+        if not self.execution_folder.is_dir():
+            return []
+
+        names = {resource["name"] for resource in self.application.resources}
+        orphans = []
+        for workdir in sorted(self.execution_folder.iterdir()):
+            resource_yaml_path = workdir / "resource.yaml"
+            if workdir.name in names or not resource_yaml_path.is_file():
+                continue
+
+            resource = yaml.safe_load(resource_yaml_path.read_text())
+            if resource.get("name") != workdir.name or "kind" not in resource:
+                logger.warning(f"Ignoring {resource_yaml_path}: it does not describe resource '{workdir.name}'")
+                continue
+            orphans.append(resource)
+        return orphans
+
+    def destroy(self, max_workers: int = 8):
+        """Tear down every resource, dependents before the resources they depend on.
+
+        Walks the dependency graph (`depends_on` plus references) in reverse and destroys
+        resources concurrently as soon as all of their dependents are gone. When a resource
+        fails to be destroyed, the resources it depends on are left in place. Resources that
+        were applied in the execution folder but are no longer part of the application are
+        torn down as well.
+
+        Raises when the deployment has no execution folder on this host: there is no record
+        of what was applied, so nothing can be torn down safely.
+        """
+        if not self.execution_folder.is_dir():
+            raise Exception(
+                f"No execution folder for deployment '{self.deployment.id}' at {self.execution_folder}; "
+                "it was not deployed from this working directory"
+            )
+
+        resources = {resource["name"]: resource for resource in self.application.resources}
+        for resource in self.orphaned_resources:
+            logger.warning(f"[{resource['name']}] No longer part of the application, destroying it as well")
+            resources[resource["name"]] = resource
+
+        dependencies = {}
+        dependents = {resource_name: set() for resource_name in resources}
+        for resource_name, resource in resources.items():
+            self.resource_specs[resource_name] = resource
+            self.resource_deployment_status[resource_name] = ResourceStatus("PENDING")
+
+            depends_on = set(resource.get("depends_on", [])) | self.analysis.producers.get(resource_name, set())
+            dependencies[resource_name] = {name for name in depends_on if name in resources and name != resource_name}
+            for dependency in dependencies[resource_name]:
+                dependents[dependency].add(resource_name)
+        remaining_dependents = {resource_name: len(names) for resource_name, names in dependents.items()}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(self.destroy_resource, resources[resource_name]): resource_name
+                for resource_name, count in remaining_dependents.items()
+                if count == 0
+            }
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    resource_name = futures.pop(future)
+                    self.resource_deployment_status[resource_name] = future.result()
+                    if self.resource_deployment_status[resource_name].status != "DESTROYED":
+                        continue
+
+                    for dependency in dependencies[resource_name]:
+                        remaining_dependents[dependency] -= 1
+                        if remaining_dependents[dependency] == 0:
+                            futures[pool.submit(self.destroy_resource, resources[dependency])] = dependency
+
+        self._fail_pending_teardown(dependents)
+
+    def _fail_pending_teardown(self, dependents):
+        """Mark resources that were never destroyed, because a dependent failed or because they are
+        part of (or behind) a dependency cycle."""
+        pending = {name for name, status in self.resource_deployment_status.items() if status.status == "PENDING"}
+        while pending:
+            blocked = {
+                name
+                for name in pending
+                if any(self.resource_deployment_status[dependent].status == "FAILED" for dependent in dependents[name])
+            }
+            reason = "Dependent resource failed to destroy"
+            if not blocked:
+                blocked, reason = pending, "Dependency cycle between resources"
+
+            for resource_name in blocked:
+                self.resource_deployment_status[resource_name] = ResourceStatus("FAILED", reason)
+                logger.error(f"Skipped destroying resource: {resource_name}. Reason: {reason}")
+            pending -= blocked
+
+    def destroy_resource(self, resource) -> ResourceStatus:
+        """Destroy a single resource with its plugin. Runs on a worker thread.
+
+        The `resource.yaml` written at deploy time is what the plugin applied, so that is what
+        gets destroyed. A resource is only skipped when the deploy run recorded that it gave up
+        on it before invoking its plugin; without either record the teardown fails.
+        """
+        resource_name = resource["name"]
+        workdir = self.execution_folder / resource_name
+        resource_yaml_path = workdir / "resource.yaml"
+
+        if not resource_yaml_path.exists():
+            if (workdir / NEVER_APPLIED_FILE).exists():
+                logger.info(f"[{resource_name}] Never deployed, nothing to destroy")
+                metrics.increment("resources_destroyed_total", kind=resource["kind"], status="SKIPPED")
+                return ResourceStatus("DESTROYED", "Resource was never deployed")
+
+            logger.error(f"[{resource_name}] No deployment record in {workdir}, refusing to assume it is gone")
+            metrics.increment("resources_destroyed_total", kind=resource["kind"], status="FAILED")
+            return ResourceStatus("FAILED", "No deployment record for resource")
+
+        plugin_script = self.plugins.get(resource["kind"])
+        if not plugin_script:
+            return ResourceStatus("FAILED", f"No plugin found for {resource['kind']}")
+
+        with metrics.timer("resource_destroy_seconds", kind=resource["kind"]):
+            try:
+                plugin = self.plugin_executor_class(plugin_script, workdir=workdir, env=self.plugin_env)
+                with plugin.destroy() as process:
+                    for line in process.read_stdout():
+                        self.echo(resource_name, line)
+
+                resource_status = ResourceStatus("DESTROYED", "Resource destroyed successfully")
+            except Exception as exception:
+                logger.exception(f"[{resource_name}] Failed to destroy resource", exception)
+                resource_status = ResourceStatus("FAILED", "Failed to destroy resource", exception)
+
+        metrics.increment("resources_destroyed_total", kind=resource["kind"], status=resource_status.status)
+        return resource_status
+
+    def echo(self, resource_name, line):
+        if self.capture_output:
+            self.execution_stdout.append((resource_name, line))
+        else:
+            print(line)
+
+    def release_producers(self, resource_name):
+        """Drop retained outputs once every resource that references them has been processed."""
+        for producer in self.analysis.producers.get(resource_name, ()):
+            self.pending_consumers[producer] -= 1
+            if self.pending_consumers[producer] == 0:
+                self.resource_outputs.pop(producer, None)
+
     def resolve_dependencies(self, resource) -> bool:
         """Ensure all dependencies are resolved before processing a resource. Return true if resource is ready to be processed"""
 
         depends_on = resource.get("depends_on", [])
-        unresolved_dependencies = depends_on.copy()
+        unresolved_dependencies = list(depends_on)
         while unresolved_dependencies:
-            for dep in unresolved_dependencies:
-                dependency_status = self.resource_deployment_status.get(dep, {"status": "PENDING"})["status"]
-                self.resource_deployment_status.get(dep)
+            for dep in list(unresolved_dependencies):
+                dependency_status = self.resource_deployment_status.get(dep, ResourceStatus("PENDING")).status
                 if dependency_status == "DEPLOYED":
                     unresolved_dependencies.remove(dep)
-                if dependency_status == "FAILED":
+                elif dependency_status == "FAILED":
                     return False
-                else:
-                    print(f"Waiting for dependency '{dep}' to be resolved...")
-                    time.sleep(0.1)
+
+            for dep in unresolved_dependencies:
+                print(f"Waiting for dependency '{dep}' to be resolved...")
+            if unresolved_dependencies:
+                time.sleep(0.1)
 
         return True
 
     def resolve_references(self, resource):
-        """Replace placeholders in resource properties with resolved outputs."""
+        """Return a copy of `resource` with placeholders replaced by resolved values.
+
+        Only containers are copied; the resource spec itself is left untouched so it can be
+        shared instead of deep-copied. In plan-only runs no outputs exist, so references to the
+        outputs of a known resource resolve to `KNOWN_AFTER_APPLY`.
+        """
+
+        if isinstance(resource, dict):
+            return {key: self.resolve_references(value) for key, value in resource.items()}
 
-        items = {}
         if isinstance(resource, list):
-            items = dict(enumerate(resource)).items()
-        elif isinstance(resource, dict):
-            items = resource.items()
+            return [self.resolve_references(value) for value in resource]
 
-        for key, value in items:
-            if isinstance(value, list) or isinstance(value, dict):
-                self.resolve_references(value)
-                continue
+        if not isinstance(resource, str) or "${" not in resource:
+            return resource
 
-            if not isinstance(value, str):
-                continue
+        value = resource
+        for item in REFERENCE_PATTERN.findall(resource):
+            try:
+                resource_name, section, field_name = parse_reference(item)
+                if section == "output":
+                    if self.plan_only and resource_name in self.resource_specs:
+                        resolved = self.resource_outputs.get(resource_name, {}).get(field_name, KNOWN_AFTER_APPLY)
+                    else:
+                        resolved = self.resource_outputs[resource_name][field_name]
+                else:
+                    resolved = self.resource_specs[resource_name][section][field_name]
+                value = value.replace(f"${{{item}}}", str(resolved))
+            except (ValueError, KeyError, TypeError) as exc:
+                raise Exception(f"Failed to resolve dependency '{item}'") from exc
 
-            for item in re.findall(r"\$\{(.*?)\}", value):
-                try:
-                    resource_name, section, field_name = item.split(".", 2)
-                    resource[key] = value.replace(
-                        f"${{{item}}}", self.resource_data[resource_name][section][field_name]
-                    )
-                except ValueError as exc:
-                    raise Exception(f"Failed to resolve dependency '{item}'") from exc
-                except KeyError as exc:
-                    raise Exception(f"Failed to resolve dependency '{item}'") from exc
-
-        return resource
+        return value
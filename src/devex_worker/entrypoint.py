@@ -0,0 +1,20 @@
+import sys
+from pathlib import Path
+
+
+def main():
+    """Console script entry point (`devex-worker`).
+
+    The worker modules import each other as top-level modules (`from session import Session`),
+    the same way `cli.py` resolves them when run as a script, so put this directory on the path
+    before loading the CLI.
+    """
+    sys.path.insert(0, str(Path(__file__).parent))
+
+    from cli import cli
+
+    cli()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+class _NullTimer:
+    """Context manager returned when instrumentation is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    def __init__(self, registry, name: str, labels: LabelSet):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.registry.observe(self.name, time.perf_counter() - self.started, _labels=self.labels)
+        return False
+
+
+class Metrics:
+    """Process wide counters and timers.
+
+    Instrumentation is disabled by default. While disabled, `timer()` hands out a shared
+    no-op context manager and `increment()`/`observe()` return before taking the lock, so
+    the hot path only pays for one attribute check.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelSet, float]] = {}
+        self._timers: Dict[str, Dict[LabelSet, list]] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def enable(self):
+        self.enabled = True
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+
+    def increment(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, _labels: Optional[LabelSet] = None, **labels):
+        if not self.enabled:
+            return
+
+        key = _labels if _labels is not None else tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._timers.setdefault(name, {})
+            stats = series.get(key)
+            if stats is None:
+                series[key] = [1, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                stats[2] = max(stats[2], seconds)
+
+    def timer(self, name: str, **labels):
+        """Time the enclosed block and record it under `name` (in seconds)."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, tuple(sorted(labels.items())))
+
+    def timed(self, name: str, **labels):
+        """Decorator version of `timer()`."""
+
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def summary(self) -> Dict[str, dict]:
+        """Return a JSON serializable snapshot of all recorded metrics."""
+        with self._lock:
+            counters = {
+                name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                for name, series in self._counters.items()
+            }
+            timers = {
+                name: [
+                    {"labels": dict(key), "count": count, "sum": total, "max": maximum}
+                    for key, (count, total, maximum) in series.items()
+                ]
+                for name, series in self._timers.items()
+            }
+        return {"counters": counters, "timers": timers}
+
+    def render_prometheus(self) -> str:
+        """Render all recorded metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE devex_{name} counter")
+                for key, value in series.items():
+                    lines.append(f"devex_{name}{_format_labels(key)} {value}")
+
+            for name, series in sorted(self._timers.items()):
+                lines.append(f"# TYPE devex_{name} summary")
+                for key, (count, total, _) in series.items():
+                    lines.append(f"devex_{name}_count{_format_labels(key)} {count}")
+                    lines.append(f"devex_{name}_sum{_format_labels(key)} {total}")
+        return "\n".join(lines) + "\n"
+
+    def start_http_server(self, port: int, host: str = "127.0.0.1"):
+        """Serve `/metrics` from a background thread."""
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+
+                body = registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.enable()
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+
+    def load_jsonl(self, path):
+        """Merge timings written by a plugin process (one JSON object per line)."""
+        if not self.enabled:
+            return
+
+        try:
+            with open(path, "r") as file:
+                for line in file:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.observe(record["name"], record["value"], **record.get("labels", {}))
+        except FileNotFoundError:
+            pass
+
+
+def _format_labels(labels: LabelSet) -> str:
+    if not labels:
+        return ""
+
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels) + "}"
+
+
+metrics = Metrics()
+
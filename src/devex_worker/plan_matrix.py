@@ -0,0 +1,82 @@
+import re
+from typing import Any, Dict, List
+
+PLAN_SUMMARY_PATTERN = re.compile(r"^(Plan:|No changes\.|Changes to Outputs:)")
+ANSI_ESCAPE_PATTERN = re.compile(r"\x1b\[[0-9;]*m")
+
+MISSING = "<missing>"
+
+
+def flatten(value: Any, prefix: str = "") -> Dict[str, Any]:
+    """Flatten nested dicts/lists into `{"a.b.0.c": value}`."""
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = enumerate(value)
+    else:
+        return {prefix: value}
+
+    flat = {}
+    for key, item in items:
+        flat.update(flatten(item, f"{prefix}.{key}" if prefix else str(key)))
+    return flat
+
+
+def diff_environments(resources_by_environment: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Dict[str, Dict]]:
+    """Return, per resource, the fields whose values are not identical in every environment."""
+    flattened = {
+        environment: {resource["name"]: flatten(resource) for resource in resources}
+        for environment, resources in resources_by_environment.items()
+    }
+
+    resource_names = []
+    for resources in flattened.values():
+        resource_names.extend(name for name in resources if name not in resource_names)
+
+    differences = {}
+    for resource_name in resource_names:
+        paths = set()
+        for resources in flattened.values():
+            paths.update(resources.get(resource_name, {}))
+
+        changed = {}
+        for path in sorted(paths):
+            values = {
+                environment: resources.get(resource_name, {}).get(path, MISSING)
+                for environment, resources in flattened.items()
+            }
+            if len({repr(value) for value in values.values()}) > 1:
+                changed[path] = values
+
+        if changed:
+            differences[resource_name] = changed
+    return differences
+
+
+def plan_summary(lines: List[str]) -> List[str]:
+    """Keep the lines that summarize a plan (e.g. terraform's `Plan: 1 to add, ...`)."""
+    lines = [ANSI_ESCAPE_PATTERN.sub("", line) for line in lines]
+    return [line for line in lines if PLAN_SUMMARY_PATTERN.match(line)]
+
+
+def render_report(report: Dict[str, Any]) -> str:
+    """Human readable version of the report built by `WorkerDaemon.plan_matrix`."""
+    lines = [f"Plan matrix for '{report['application']}'", ""]
+    for environment, result in report["environments"].items():
+        lines.append(f"[{environment}] {result['status']}")
+        for resource_name, resource in result["resources"].items():
+            summary = "; ".join(resource["plan"]) or resource["reason"]
+            lines.append(f"  {resource_name}: {resource['status']} - {summary}")
+        if result.get("error"):
+            lines.append(f"  error: {result['error']}")
+    lines.append("")
+
+    if not report["differences"]:
+        lines.append("No differences between environments.")
+    for resource_name, fields in report["differences"].items():
+        lines.append(f"{resource_name}:")
+        for path, values in fields.items():
+            lines.append(f"  {path}")
+            for environment, value in values.items():
+                lines.append(f"    {environment}: {value}")
+    return "\n".join(lines)
@@ -1,14 +1,17 @@
 from contextlib import contextmanager
+import json
 import os
 from pathlib import Path
 import subprocess
 from subprocess import Popen
-from typing import Optional
+from typing import Dict, Optional
 from loguru import logger
 
+from instrumentation import metrics
+
 
 class PluginExecutor:
-    def __init__(self, entrypoint, workdir):
+    def __init__(self, entrypoint, workdir, env: Optional[Dict[str, str]] = None):
         self.entrypoint = str(entrypoint)
         self.process: Optional[Popen] = None
         self.workdir = workdir
@@ -16,27 +19,55 @@ class PluginExecutor:
         self.stderr = None
         self.env = {"PLUGIN_DIR": Path(self.entrypoint).parent.as_posix()}
         self.env.update(os.environ)
+        self.env.update(env or {})
+        if metrics.enabled:
+            self.env["DEVEX_METRICS_FILE"] = self.metrics_file_path
 
     @property
     def resource_yaml_path(self) -> str:
         return str((Path(self.workdir) / "resource.yaml").absolute())
 
+    @property
+    def metrics_file_path(self) -> str:
+        return str((Path(self.workdir) / "metrics.jsonl").absolute())
+
     @contextmanager
     def plan(self):
         logger.info("Running 'plan' stage")
-        self.start([self.entrypoint, "plan", self.resource_yaml_path])
-        yield self
-        self.wait()
+        with metrics.timer("plugin_stage_seconds", stage="plan"):
+            self.start([self.entrypoint, "plan", self.resource_yaml_path])
+            yield self
+            self.wait()
         logger.info("Completed 'plan' stage")
 
     @contextmanager
     def deploy(self):
         logger.info("Running 'deploy' stage")
-        self.start([self.entrypoint, "deploy", self.resource_yaml_path])
-        yield self
-        self.wait()
+        with metrics.timer("plugin_stage_seconds", stage="deploy"):
+            self.start([self.entrypoint, "deploy", self.resource_yaml_path])
+            yield self
+            self.wait()
         logger.info("Completed 'deploy' stage")
 
+    @contextmanager
+    def destroy(self):
+        logger.info("Running 'destroy' stage")
+        with metrics.timer("plugin_stage_seconds", stage="destroy"):
+            self.start([self.entrypoint, "destroy", self.resource_yaml_path])
+            yield self
+            self.wait()
+        logger.info("Completed 'destroy' stage")
+
+    def output(self):
+        """Run the 'output' stage and return the JSON document printed last by the plugin."""
+        logger.info("Running 'output' stage")
+        with metrics.timer("plugin_stage_seconds", stage="output"):
+            self.start([self.entrypoint, "output", self.resource_yaml_path])
+            self.wait()
+
+        lines = [line for line in self.stdout.decode("utf-8").splitlines() if line.strip()]
+        return json.loads(lines[-1]) if lines else {}
+
     def start(self, command):
         logger.info(f"Running command: {' '.join(command)}")
         self.process = Popen(
@@ -53,5 +84,8 @@ class PluginExecutor:
 
     def wait(self):
         self.stdout, self.stderr = self.process.communicate()
+        if metrics.enabled:
+            metrics.load_jsonl(self.metrics_file_path)
+            Path(self.metrics_file_path).unlink(missing_ok=True)
         if self.process.returncode != 0:
             raise Exception(f"Command failed with exit code {self.process.returncode}")
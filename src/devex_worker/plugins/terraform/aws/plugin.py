@@ -1,5 +1,7 @@
+import fcntl
 from functools import cached_property
 import json
+import os
 from pathlib import Path
 import time
 from jinja2 import Template
@@ -38,6 +40,15 @@ class ResourceHandler:
         self.tf_runner.apply()
         return {}
 
+    def output(self):
+        return {name: output["value"] for name, output in self.tf_runner.output().items()}
+
+    def destroy(self):
+        self.render_terraform_file()
+        self.tf_runner.init()
+        self.tf_runner.destroy()
+        return {}
+
     def render_terraform_file(self):
         with open(ResourceHandler.TEMPLATE_FILE, "r") as f:
             tf_template_content = f.read()
@@ -56,7 +67,17 @@ class ResourceHandler:
             self.working_dir = Path(working_dir)
 
         def init(self):
-            stdout, _ = self._run_terraform_command(["terraform", "init"])
+            plugin_cache_dir = os.environ.get("TF_PLUGIN_CACHE_DIR")
+            if not plugin_cache_dir:
+                stdout, _ = self._run_terraform_command(["terraform", "init"])
+                return stdout
+
+            # The provider cache is shared between concurrent plans and terraform does not
+            # guarantee it is safe for concurrent writers, so serialize `init` around it.
+            Path(plugin_cache_dir).mkdir(parents=True, exist_ok=True)
+            with open(Path(plugin_cache_dir) / ".init.lock", "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                stdout, _ = self._run_terraform_command(["terraform", "init"])
             return stdout
 
         def plan(self):
@@ -77,19 +98,39 @@ class ResourceHandler:
 
         def _run_terraform_command(self, command):
             logger.info(f"Running terraform command: {' '.join(command)}")
+            started = time.perf_counter()
+            try:
+                return self._execute(command)
+            finally:
+                self._record_timing(command[1], time.perf_counter() - started)
+
+        def _record_timing(self, subcommand, seconds):
+            """Report the duration to the worker when it runs with metrics enabled."""
+            metrics_file = os.environ.get("DEVEX_METRICS_FILE")
+            if not metrics_file:
+                return
+
+            record = {"name": "terraform_command_seconds", "labels": {"command": subcommand}, "value": seconds}
+            with open(metrics_file, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+        def _execute(self, command):
             process = subprocess.Popen(command, cwd=self.working_dir, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            # Streaming consumes stdout, so keep the lines for callers that parse it (e.g. `output -json`)
+            streamed = []
             for line in iter(process.stdout.readline, b""):
+                streamed.append(line)
                 print(line.decode("utf-8").strip())
 
-            stdout, stderr = process.communicate()
+            remaining, stderr = process.communicate()
             if process.returncode != 0:
                 raise Exception(f"Terraform command failed: {stderr.decode('utf-8')}")
-            return stdout.decode("utf-8"), stderr
+            return (b"".join(streamed) + remaining).decode("utf-8"), stderr
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Terraform Resource Handler")
-    parser.add_argument("action", choices=["plan", "deploy", "destroy"], help="Action to perform")
+    parser.add_argument("action", choices=["plan", "deploy", "output", "destroy"], help="Action to perform")
     parser.add_argument("resource", type=str, help="Path to the resource YAML file")
 
     args = parser.parse_args()
@@ -104,6 +145,6 @@ if __name__ == "__main__":
     elif args.action == "deploy":
         handler.deploy()
     elif args.action == "output":
-        print(handler.output())
+        print(json.dumps(handler.output()))
     elif args.action == "destroy":
-        handler.tf_runner.destroy()
+        handler.destroy()
@@ -0,0 +1,55 @@
+import re
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+REFERENCE_PATTERN = re.compile(r"\$\{(.*?)\}")
+
+Reference = Tuple[str, str, str]
+
+
+def find_references(value: Any) -> Iterator[str]:
+    """Yield the raw `${...}` placeholders found anywhere in a nested value."""
+    if isinstance(value, dict):
+        for item in value.values():
+            yield from find_references(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from find_references(item)
+    elif isinstance(value, str) and "${" in value:
+        yield from REFERENCE_PATTERN.findall(value)
+
+
+def parse_reference(item: str) -> Reference:
+    """Split `resource.section.field` into its parts. Raises ValueError for malformed references."""
+    resource_name, section, field_name = item.split(".", 2)
+    return resource_name, section, field_name
+
+
+class ReferenceAnalysis:
+    """Which resources consume which fields of other resources.
+
+    Built once per application so an execution knows up front which output fields are
+    worth keeping, and when the last consumer of a resource has run.
+    """
+
+    def __init__(self, resources: List[Dict[str, Any]]):
+        self.producers: Dict[str, Set[str]] = {}
+        self.consumer_count: Dict[str, int] = {}
+        self.retained_fields: Dict[str, Set[str]] = {}
+
+        for resource in resources:
+            consumer = resource["name"]
+            references = set()
+            for item in find_references(resource):
+                try:
+                    references.add(parse_reference(item))
+                except ValueError:
+                    # Malformed references are reported when the resource is resolved
+                    continue
+
+            self.producers[consumer] = {resource_name for resource_name, _, _ in references}
+            for resource_name, section, field_name in references:
+                if section == "output":
+                    self.retained_fields.setdefault(resource_name, set()).add(field_name)
+
+            for producer in self.producers[consumer]:
+                self.consumer_count[producer] = self.consumer_count.get(producer, 0) + 1
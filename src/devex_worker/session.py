@@ -1,6 +1,5 @@
 import os
 import click
-import requests
 import base64
 
 TOKEN_FILE = os.path.expanduser("~/.devex/token")
@@ -25,6 +24,8 @@ class Session:
 
     def login(self, username, password):
         """Login to the API and save the token."""
+        import requests
+
         response = requests.post(f"{self.api_base_url}/login/", json={"username": username, "password": password})
         if response.status_code == 200:
             self.token = response.json().get("tokens")["access"]
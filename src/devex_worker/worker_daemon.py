@@ -1,13 +1,19 @@
+from concurrent.futures import ThreadPoolExecutor
 from functools import cached_property
+from itertools import repeat
+import json
 from pathlib import Path
 import threading
-from typing import Optional
+from typing import Any, Dict, List, Optional
 import yaml
 from loguru import logger
 import time
 from uuid import uuid4
 
 from deployment_execution import DeploymentExecution
+from instrumentation import metrics
+from plan_matrix import diff_environments, plan_summary, render_report
+from reference_analysis import ReferenceAnalysis
 from services.application_service import Application, ApplicationService
 from services.configuration_service import Configuration, ConfigurationService
 from services.deployment_service import DeploymentService, Deployment
@@ -15,34 +21,74 @@ from session import Session
 
 
 class WorkerDaemon:
+    PLUGINS_DIR = Path(__file__).parent / "plugins"
+    MAX_THREADS = 3
+    DESTROY_STATE = "destroy_pending"
+    DESTROY_CONCURRENCY = 8
+    PLAN_MATRIX_STATE = "plan_matrix_pending"
+
     @staticmethod
-    def start():
+    def start(metrics_port: Optional[int] = None):
+        if metrics_port is not None:
+            metrics.start_http_server(metrics_port)
+
         deployment_service = DeploymentService(session=Session.load_session())
         active_threads = []
-        max_threads = 3
 
         scheduled_deployments = []
         while True:
-            pending_deployments = [d for d in deployment_service.get_all() if d.state == "pending"]
+            active_threads = WorkerDaemon.schedule(deployment_service, active_threads, scheduled_deployments)
+            time.sleep(10)
 
-            for deployment in pending_deployments:
-                if deployment.id in scheduled_deployments:
-                    continue
+    @staticmethod
+    def schedule(
+        deployment_service: DeploymentService,
+        active_threads: List[threading.Thread],
+        scheduled_deployments: List,
+        plugins_dir: Optional[Path] = None,
+    ) -> List[threading.Thread]:
+        """One polling pass of the daemon: start workers for pending deployments and
+        return the worker threads that are still running."""
+        pending_deployments = [
+            d
+            for d in deployment_service.get_all()
+            if d.state in ("pending", WorkerDaemon.DESTROY_STATE, WorkerDaemon.PLAN_MATRIX_STATE)
+        ]
 
-                if len(active_threads) > max_threads:
-                    continue
+        for deployment in pending_deployments:
+            # A deployment is scheduled again when it is later marked for teardown
+            if (deployment.id, deployment.state) in scheduled_deployments:
+                continue
+
+            if len(active_threads) >= WorkerDaemon.MAX_THREADS:
+                continue
 
+            worker = WorkerDaemon(deployment=deployment, plugins_dir=plugins_dir)
+            if deployment.state == WorkerDaemon.DESTROY_STATE:
+                logger.info(f"Scheduling teardown: {deployment.id}")
+                t = threading.Thread(target=worker.destroy)
+            elif deployment.state == WorkerDaemon.PLAN_MATRIX_STATE:
+                logger.info(f"Scheduling plan matrix: {deployment.id}")
+                t = threading.Thread(target=worker.run_plan_matrix)
+            else:
                 logger.info(f"Scheduling deployment: {deployment.id}")
-                t = threading.Thread(target=WorkerDaemon(deployment=deployment).run)
-                t.start()
-                active_threads.append(t)
-                scheduled_deployments.append(deployment.id)
+                t = threading.Thread(target=worker.run)
+            t.start()
+            active_threads.append(t)
+            scheduled_deployments.append((deployment.id, deployment.state))
 
-            active_threads = [t for t in active_threads if t.is_alive()]
-            time.sleep(10)
+        return [t for t in active_threads if t.is_alive()]
 
-    def __init__(self, deployment: Deployment = None, application_file: str = None, configuration_file: str = None):
+    def __init__(
+        self,
+        deployment: Deployment = None,
+        application_file: str = None,
+        configuration_file: str = None,
+        plugins_dir: Optional[Path] = None,
+        deployment_id: Optional[str] = None,
+    ):
         self.plugins = {}
+        self.plugins_dir = Path(plugins_dir) if plugins_dir else WorkerDaemon.PLUGINS_DIR
 
         self.configuration: Optional[Configuration] = None
         self.application: Optional[Application] = None
@@ -53,7 +99,7 @@ class WorkerDaemon:
         else:
             self.local_run = True
             self.deployment = Deployment()
-            self.deployment.id = uuid4()
+            self.deployment.id = deployment_id or uuid4()
 
             self.application_file = application_file
             self.configuration_file = configuration_file
@@ -70,10 +116,18 @@ class WorkerDaemon:
     def deployment_service(self):
         return DeploymentService(session=Session.load_session())
 
+    @cached_property
+    def terraform_plugin_cache(self) -> Path:
+        cache_path = Path().cwd() / ".devex-runner/terraform-plugin-cache"
+        cache_path.mkdir(parents=True, exist_ok=True)
+        return cache_path
+
+    @metrics.timed("load_data_from_api_seconds")
     def load_data_from_api(self):
         self.configuration = self.configuration_service.get(self.deployment.configuration_id)
         self.application = self.application_service.get(self.deployment.application_id)
 
+    @metrics.timed("load_data_from_local_seconds")
     def load_data_from_local(self):
         self.application = Application(id=uuid4(), name="local")
         self.application.definition = self._parse_yaml(self.application_file)
@@ -81,45 +135,35 @@ class WorkerDaemon:
         self.configuration = Configuration()
         self.configuration.definition = self._parse_yaml(self.configuration_file)
 
-    def load_plugins(self):
-        """Dynamically load plugins for different kinds of resources."""
-        plugins_dir = Path(__file__).parent / "plugins"
+    def load_plugins(self, resources=None):
+        """Dynamically load plugins for different kinds of resources (of the application by default)."""
+        plugins_dir = self.plugins_dir
         if not plugins_dir.exists():
             logger.error(f"Warning: No plugins found")
             return
 
-        for resource in self.application.resources:
+        for resource in self.application.resources if resources is None else resources:
             kind = resource["kind"]  # Convert kind to valid module name
             if kind in self.plugins:
+                metrics.increment("plugin_lookups_total", kind=kind, result="reused")
                 continue
 
+            metrics.increment("plugin_lookups_total", kind=kind, result="located")
+
             entrypoint_path = plugins_dir / kind / "plugin.sh"
             if entrypoint_path.exists():
                 self.plugins[resource["kind"]] = entrypoint_path
             else:
                 logger.error(f"Warning: No plugin found for {kind}, skipping...")
 
-    def run(self, plan_only=False):
-        """Worker function to process resources from the queue."""
+    @metrics.timed("deployment_seconds")
+    def run(self, plan_only=False) -> Optional[str]:
+        """Worker function to process resources from the queue. Returns the final deployment status."""
 
         logger.info(f"[{self.deployment.id}] Processing deployment...")
         deployment_status = None
         try:
-            if not self.local_run:
-                self.load_data_from_api()
-            else:
-                self.load_data_from_local()
-
-            self.load_plugins()
-
-            worker_deployment = DeploymentExecution(
-                plugins=self.plugins,
-                deployment=self.deployment,
-                application=self.application,
-                configuration=self.configuration,
-                plan_only=plan_only,
-            )
-            worker_deployment.merge_definition_and_configuration()
+            worker_deployment = self._prepare_execution(plan_only=plan_only)
             worker_deployment.run()
 
             deployment_status = worker_deployment.deployment_status
@@ -127,10 +171,194 @@ class WorkerDaemon:
             logger.exception(exc)
             deployment_status = "failed"
         finally:
-            logger.info(f"[{self.deployment.id}] Updating deployment status to '{deployment_status}'")
-            if not self.local_run:
-                self.deployment.state = deployment_status
-                self.deployment_service.update(self.deployment.id, self.deployment.as_dict())
+            metrics.increment("deployments_total", status=deployment_status)
+            self._update_deployment_state(deployment_status)
+
+        return deployment_status
+
+    @metrics.timed("teardown_seconds")
+    def destroy(self, max_workers: Optional[int] = None) -> Optional[str]:
+        """Tear down all resources of the deployment. Returns 'destroyed' or 'destroy_failed'."""
+
+        logger.info(f"[{self.deployment.id}] Destroying deployment...")
+        deployment_status = None
+        try:
+            worker_deployment = self._prepare_execution(plan_only=False)
+            self.load_plugins(worker_deployment.orphaned_resources)
+            worker_deployment.destroy(max_workers=max_workers or WorkerDaemon.DESTROY_CONCURRENCY)
+
+            deployment_status = worker_deployment.teardown_status
+        except Exception as exc:
+            logger.exception(exc)
+            deployment_status = "destroy_failed"
+        finally:
+            metrics.increment("teardowns_total", status=deployment_status)
+            self._update_deployment_state(deployment_status)
+
+        return deployment_status
+
+    def _prepare_execution(self, plan_only) -> DeploymentExecution:
+        if not self.local_run:
+            self.load_data_from_api()
+        else:
+            self.load_data_from_local()
+
+        self.load_plugins()
+
+        worker_deployment = DeploymentExecution(
+            plugins=self.plugins,
+            deployment=self.deployment,
+            application=self.application,
+            configuration=self.configuration,
+            plan_only=plan_only,
+        )
+        worker_deployment.merge_definition_and_configuration()
+        return worker_deployment
+
+    def _update_deployment_state(self, deployment_status):
+        logger.info(f"[{self.deployment.id}] Updating deployment status to '{deployment_status}'")
+        if not self.local_run:
+            self.deployment.state = deployment_status
+            self.deployment_service.update(self.deployment.id, self.deployment.as_dict())
+
+    def plan_matrix(self, configuration_files: List[str]) -> Dict[str, Any]:
+        """Plan the local application against several configuration files concurrently."""
+        self.application = Application(id=uuid4(), name="local")
+        self.application.definition = self._parse_yaml(self.application_file)
+
+        configurations: Dict[str, Configuration] = {}
+        for configuration_file in configuration_files:
+            configuration = Configuration()
+            configuration.definition = self._parse_yaml(configuration_file)
+            environment = self._environment_name(configuration, Path(configuration_file).stem, configurations)
+            configurations[environment] = configuration
+
+        return self._plan_environments(configurations)
+
+    def run_plan_matrix(self) -> Optional[str]:
+        """Daemon mode of `plan_matrix`: plan the deployment's application against every
+        configuration of that application. Returns 'planned' or 'plan_failed'.
+
+        The report is logged and written to `plan-matrix.json` in the deployment's execution folder.
+        """
+        logger.info(f"[{self.deployment.id}] Planning deployment against all configurations...")
+        status = None
+        try:
+            self.application = self.application_service.get(self.deployment.application_id)
+            configurations: Dict[str, Configuration] = {}
+            for configuration in self.configuration_service.get_all():
+                if str(configuration.application_id) != str(self.deployment.application_id):
+                    continue
+                environment = self._environment_name(configuration, configuration.name or configuration.id, configurations)
+                configurations[environment] = configuration
+
+            if not configurations:
+                raise Exception(f"No configurations found for application {self.deployment.application_id}")
+
+            report = self._plan_environments(configurations)
+            report_path = Path().cwd() / f".devex-runner/executions/{self.deployment.id}/plan-matrix.json"
+            report_path.parent.mkdir(parents=True, exist_ok=True)
+            report_path.write_text(json.dumps(report, indent=2, default=str))
+            logger.info(f"[{self.deployment.id}] Plan matrix report written to {report_path}\n{render_report(report)}")
+
+            planned = all(result["status"] == "planned" for result in report["environments"].values())
+            status = "planned" if planned else "plan_failed"
+        except Exception as exc:
+            logger.exception(exc)
+            status = "plan_failed"
+        finally:
+            metrics.increment("plan_matrices_total", status=status)
+            self._update_deployment_state(status)
+
+        return status
+
+    @metrics.timed("plan_matrix_seconds")
+    def _plan_environments(self, configurations: Dict[str, Configuration]) -> Dict[str, Any]:
+        """Plan `self.application` against several configurations concurrently.
+
+        Plugins are located and references analysed once. Every environment then merges its
+        configuration into the same serialized definition and plans in its own execution
+        folder, sharing Terraform providers through TF_PLUGIN_CACHE_DIR.
+        """
+        logger.info(f"[{self.deployment.id}] Planning {len(configurations)} environments...")
+        self.load_plugins()
+
+        analysis = ReferenceAnalysis(self.application.resources)
+        definition_as_string = yaml.dump(self.application.definition)
+        plugin_env = {"TF_PLUGIN_CACHE_DIR": str(self.terraform_plugin_cache)}
+
+        executions: Dict[str, DeploymentExecution] = {}
+        for environment, configuration in configurations.items():
+            deployment = Deployment()
+            deployment.id = f"{self.deployment.id}-{environment}"
+            executions[environment] = DeploymentExecution(
+                plugins=self.plugins,
+                application=Application(id=self.application.id, name=self.application.name),
+                configuration=configuration,
+                deployment=deployment,
+                plan_only=True,
+                analysis=analysis,
+                plugin_env=plugin_env,
+                capture_output=True,
+            )
+
+        with ThreadPoolExecutor(max_workers=len(executions)) as pool:
+            errors = pool.map(self._plan_environment, executions.values(), repeat(definition_as_string))
+            errors = dict(zip(executions, errors))
+
+        return self._plan_matrix_report(executions, errors)
+
+    def _plan_environment(self, execution: DeploymentExecution, definition_as_string: str) -> Optional[str]:
+        """Plan a single environment of a plan matrix. Returns the error message if it failed."""
+        try:
+            execution.merge_definition_and_configuration(definition_as_string)
+            execution.run()
+        except Exception as exc:
+            logger.exception(exc)
+            return str(exc)
+
+        return None
+
+    def _plan_matrix_report(self, executions: Dict[str, DeploymentExecution], errors: Dict[str, Optional[str]]):
+        environments = {}
+        for environment, execution in executions.items():
+            output_by_resource: Dict[str, List[str]] = {}
+            for resource_name, line in execution.execution_stdout:
+                output_by_resource.setdefault(resource_name, []).append(line)
+
+            status = "failed" if errors[environment] else execution.deployment_status
+            environments[environment] = {
+                "status": "planned" if status == "deployed" else status,
+                "error": errors[environment],
+                "resources": {
+                    resource_name: {
+                        "status": "PLANNED" if resource_status.status == "DEPLOYED" else resource_status.status,
+                        "reason": resource_status.reason,
+                        "plan": plan_summary(output_by_resource.get(resource_name, [])),
+                    }
+                    for resource_name, resource_status in execution.resource_deployment_status.items()
+                },
+            }
+
+        merged_resources = {
+            environment: execution.application.resources
+            for environment, execution in executions.items()
+            if execution.application.definition
+        }
+        return {
+            "application": self.application.definition.get("name", self.application.name),
+            "environments": environments,
+            "differences": diff_environments(merged_resources),
+        }
+
+    @staticmethod
+    def _environment_name(configuration: Configuration, fallback, taken) -> str:
+        environment = str(configuration.definition.get("config", {}).get("env") or fallback)
+        name, index = environment, 2
+        while name in taken:
+            name = f"{environment}-{index}"
+            index += 1
+        return name
 
     def _parse_yaml(self, file_path):
         with open(file_path, "r") as file: